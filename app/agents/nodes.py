@@ -1,29 +1,38 @@
 from typing import List, Dict, Any, Tuple
 from ..retrieval.vectorstore import VectorStore
+from ..retrieval.collections import Collection
 from ..utils.text import truncate, needs_refusal
 from ..utils.tracing import span
+from ..utils.admission import AdmissionController
 from ..schemas.api import Citation
 from ..config import settings
 
 from openai import OpenAI
 client = OpenAI(api_key=settings.OPENAI_API_KEY)
 
+_max_wait_s = {"interactive": settings.INTERACTIVE_MAX_WAIT_S, "background": settings.BACKGROUND_MAX_WAIT_S}
+chat_limiter = AdmissionController("chat", settings.CHAT_MAX_CONCURRENCY, settings.UPSTREAM_MAX_QUEUE, _max_wait_s)
+embedding_limiter = AdmissionController("embedding", settings.EMBEDDING_MAX_CONCURRENCY, settings.UPSTREAM_MAX_QUEUE, _max_wait_s)
+
 def get_embedding_fn():
     def _embed(texts: List[str]) -> List[List[float]]:
-        resp = client.embeddings.create(
-            model=settings.EMBEDDING_MODEL,
-            input=texts
-        )
+        with embedding_limiter.slot():
+            resp = client.embeddings.create(
+                model=settings.EMBEDDING_MODEL,
+                input=texts
+            )
         return [d.embedding for d in resp.data]
     return _embed
 
 def build_vectorstore() -> VectorStore:
     return VectorStore(embedding_fn=get_embedding_fn())
 
-def retrieve_and_cite(question: str, k: int = 5) -> Tuple[List[Dict[str, Any]], List[Citation], float, int]:
-    with span("retrieve"):
-        vs = build_vectorstore()
-        hits = vs.search(question, k=k)
+def build_collection(name: str | None = None) -> Collection:
+    return Collection(name, embedding_fn=get_embedding_fn())
+
+def retrieve_and_cite(question: str, k: int = 5, collection: str | None = None) -> Tuple[List[Dict[str, Any]], List[Citation], float, int]:
+    with span("retrieve", {"collection": collection}):
+        hits = build_collection(collection).search(question, k=k)
     citations: List[Citation] = []
     top_score = 0.0
     coverage_tokens = 0
@@ -53,7 +62,7 @@ def synthesize_answer(question: str, citations: List[Citation]) -> str:
         "Answer with short paragraphs and bullet points where helpful. "
         "If you are unsure, say you cannot answer confidently and suggest next steps."
     )
-    with span("llm.answer"):
+    with chat_limiter.slot(), span("llm.answer"):
         resp = client.chat.completions.create(
             model=settings.CHAT_MODEL,
             messages=[
@@ -8,6 +8,16 @@ class Settings(BaseSettings):
     CHAT_MODEL: str = Field(default="gpt-4o-mini")
     STORAGE_DIR: str = Field(default="./storage")
     APP_SECRET: str = Field(default="dev-secret")
+    DEFAULT_COLLECTION: str = Field(default="default")
+    DEFAULT_SHARDS: int = Field(default=1)
+    SEARCH_WORKERS: int = Field(default=16)
+    CHAT_MAX_CONCURRENCY: int = Field(default=8)
+    EMBEDDING_MAX_CONCURRENCY: int = Field(default=8)
+    UPSTREAM_MAX_QUEUE: int = Field(default=32)  # per limiter, per priority
+    INTERACTIVE_MAX_WAIT_S: float = Field(default=10.0)
+    BACKGROUND_MAX_WAIT_S: float = Field(default=120.0)
+    THREADPOOL_HEADROOM: int = Field(default=16)
+    UPSTREAM_RETRY_AFTER_S: int = Field(default=5)
 
     model_config = SettingsConfigDict(env_file=".env", case_sensitive=True)
 
@@ -1,17 +1,17 @@
 import sqlite3
 import os
-from typing import Iterable, Dict, Any
+from typing import Iterable, Iterator, Dict, Any
 from .config import settings
 
 DB_PATH = os.path.join(settings.STORAGE_DIR, "meta.db")
 
-def get_conn():
-    conn = sqlite3.connect(DB_PATH)
+def get_conn(db_path: str | None = None):
+    conn = sqlite3.connect(db_path or DB_PATH)
     conn.row_factory = sqlite3.Row
     return conn
 
-def init_db():
-    conn = get_conn()
+def init_db(db_path: str | None = None):
+    conn = get_conn(db_path)
     cur = conn.cursor()
     cur.executescript(
         '''
@@ -20,7 +20,8 @@ def init_db():
             title TEXT,
             source_uri TEXT,
             created_at TEXT,
-            tags TEXT
+            tags TEXT,
+            collection TEXT DEFAULT 'default'
         );
         CREATE TABLE IF NOT EXISTS chunks (
             id TEXT PRIMARY KEY,
@@ -30,27 +31,33 @@ def init_db():
             heading TEXT,
             source_uri TEXT,
             faiss_id INTEGER,
+            shard INTEGER DEFAULT 0,
             FOREIGN KEY(document_id) REFERENCES documents(id)
         );
         '''
     )
+    # faiss_id is a row within one shard; (documents.collection, chunks.shard) locate that shard
+    for table, col, decl in (("documents", "collection", "TEXT DEFAULT 'default'"), ("chunks", "shard", "INTEGER DEFAULT 0")):
+        cols = {r["name"] for r in cur.execute(f"PRAGMA table_info({table})").fetchall()}
+        if col not in cols:
+            cur.execute(f"ALTER TABLE {table} ADD COLUMN {col} {decl}")
     conn.commit()
     conn.close()
 
 def insert_document(doc: Dict[str, Any]):
     conn = get_conn()
     conn.execute(
-        "INSERT INTO documents (id, title, source_uri, created_at, tags) VALUES (?, ?, ?, ?, ?)",
-        (doc["id"], doc["title"], doc.get("source_uri",""), doc["created_at"], doc.get("tags","")),
+        "INSERT INTO documents (id, title, source_uri, created_at, tags, collection) VALUES (?, ?, ?, ?, ?, ?)",
+        (doc["id"], doc["title"], doc.get("source_uri",""), doc["created_at"], doc.get("tags",""), doc.get("collection") or settings.DEFAULT_COLLECTION),
     )
     conn.commit()
     conn.close()
 
-def insert_chunks(rows: Iterable[Dict[str, Any]]):
-    conn = get_conn()
+def insert_chunks(rows: Iterable[Dict[str, Any]], db_path: str | None = None):
+    conn = get_conn(db_path)
     conn.executemany(
-        "INSERT INTO chunks (id, document_id, text, page, heading, source_uri, faiss_id) VALUES (?, ?, ?, ?, ?, ?, ?)",
-        [(r["id"], r["document_id"], r["text"], r["page"], r["heading"], r.get("source_uri",""), r["faiss_id"]) for r in rows]
+        "INSERT INTO chunks (id, document_id, text, page, heading, source_uri, faiss_id, shard) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+        [(r["id"], r["document_id"], r["text"], r["page"], r["heading"], r.get("source_uri",""), r["faiss_id"], r.get("shard", 0)) for r in rows]
     )
     conn.commit()
     conn.close()
@@ -75,3 +82,33 @@ def get_chunks_by_ids(ids: list[str]) -> list[dict]:
     rows = conn.execute(q, ids).fetchall()
     conn.close()
     return [dict(r) for r in rows]
+
+def insert_documents(docs: Iterable[Dict[str, Any]], db_path: str | None = None):
+    conn = get_conn(db_path)
+    conn.executemany(
+        "INSERT INTO documents (id, title, source_uri, created_at, tags, collection) VALUES (?, ?, ?, ?, ?, ?)",
+        [(d["id"], d["title"], d.get("source_uri",""), d["created_at"], d.get("tags",""), d.get("collection") or settings.DEFAULT_COLLECTION) for d in docs]
+    )
+    conn.commit()
+    conn.close()
+
+def iter_rows(table: str, batch_size: int = 500) -> Iterator[Dict[str, Any]]:
+    if table not in ("documents", "chunks"):
+        raise ValueError(f"Unknown table: {table}")
+    conn = get_conn()
+    try:
+        cur = conn.execute(f"SELECT * FROM {table} ORDER BY rowid")
+        while True:
+            rows = cur.fetchmany(batch_size)
+            if not rows:
+                break
+            for r in rows:
+                yield dict(r)
+    finally:
+        conn.close()
+
+def count_documents() -> int:
+    conn = get_conn()
+    n = conn.execute("SELECT COUNT(*) FROM documents").fetchone()[0]
+    conn.close()
+    return n
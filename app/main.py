@@ -1,27 +1,52 @@
-import os, uuid, datetime
+import os, json, uuid, datetime, tempfile
+import anyio
+from contextlib import asynccontextmanager
 from typing import List
 from fastapi import FastAPI, UploadFile, File, Form, Depends, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, JSONResponse
+from fastapi.concurrency import run_in_threadpool
+from openai import APIError, APIConnectionError, APIStatusError, RateLimitError
+from starlette.background import BackgroundTask
 from pathlib import Path
 from dotenv import load_dotenv
 from .config import settings
 from .db import init_db, insert_document, insert_chunks, get_document, get_chunks_by_doc
 from .ingest.parser import parse_pdf, parse_docx, parse_html, parse_txt
 from .ingest.chunker import chunk_text, attach_metadata
-from .retrieval.vectorstore import VectorStore
+from .retrieval.collections import Collection, list_collections, validate_name
 from .schemas.api import IngestResponse, QueryRequest, AnswerResponse
 from .agents.graph import run_answer_pipeline, run_form_pipeline
-from .agents.nodes import get_embedding_fn
+from .agents.nodes import get_embedding_fn, chat_limiter, embedding_limiter
 from .utils.security import require_auth
+from .utils.locks import store_lock
+from .utils.singleflight import SingleFlight
+from .utils.admission import Overloaded, PRIORITIES, priority
+from .utils.text import normalize_question
+from .retrieval.snapshot import export_snapshot, import_snapshot, SnapshotError, StoreNotEmpty
 
 load_dotenv()
 
+def threadpool_size() -> int:
+    """Worker threads needed so every admitted or queued upstream call has one, plus headroom"""
+    queued = 2 * len(PRIORITIES) * settings.UPSTREAM_MAX_QUEUE  # chat + embedding, one queue per priority
+    return (settings.CHAT_MAX_CONCURRENCY + settings.EMBEDDING_MAX_CONCURRENCY
+            + queued + settings.THREADPOOL_HEADROOM)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Sync routes and run_in_threadpool share anyio's default limiter (40 threads).
+    # If it is smaller than the admission queues, excess callers wait there unseen
+    # instead of being rejected with 429/503 by the limiters.
+    anyio.to_thread.current_default_thread_limiter().total_tokens = threadpool_size()
+    yield
+
 app = FastAPI(
     title="Policy Q&A with Provenance & Evals",
     description="AI-powered document analysis with citations and form filling capabilities",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan,
 )
 
 # Enhanced CORS middleware for React frontend
@@ -42,12 +67,38 @@ app.add_middleware(
 init_db()
 os.makedirs(settings.STORAGE_DIR, exist_ok=True)
 
+# Identical concurrent /query requests share one pipeline run
+query_flight = SingleFlight()
+
 # Serve React static files (production build)
 frontend_path = Path(__file__).parent.parent / "frontend" / "build"
 if frontend_path.exists():
     # Mount static files (CSS, JS, images)
     app.mount("/static", StaticFiles(directory=str(frontend_path / "static")), name="static")
 
+@app.exception_handler(Overloaded)
+async def overloaded_handler(request, exc: Overloaded):
+    return JSONResponse(
+        status_code=exc.status_code,
+        content={"detail": str(exc)},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
+@app.exception_handler(APIError)
+async def upstream_error_handler(request, exc: APIError):
+    """Map OpenAI failures to HTTP statuses clients can back off on"""
+    if isinstance(exc, RateLimitError):
+        status, retry_after = 429, exc.response.headers.get("retry-after", "1")
+    elif isinstance(exc, APIConnectionError) or (isinstance(exc, APIStatusError) and exc.status_code >= 500):
+        status, retry_after = 503, str(settings.UPSTREAM_RETRY_AFTER_S)
+    else:
+        status, retry_after = 502, None
+    return JSONResponse(
+        status_code=status,
+        content={"detail": f"Upstream model provider error: {exc}"},
+        headers={"Retry-After": retry_after} if retry_after else None,
+    )
+
 # Health check endpoint
 @app.get("/health")
 async def health_check():
@@ -55,10 +106,21 @@ async def health_check():
 
 # API Routes (your existing endpoints)
 @app.post("/ingest", response_model=IngestResponse, dependencies=[Depends(require_auth)])
-async def ingest(files: List[UploadFile] = File(...), title: str = Form(None)):
+async def ingest(
+    files: List[UploadFile] = File(...),
+    title: str = Form(None),
+    collection: str = Form(None),
+    shards: int = Form(None),
+):
     """
-    Enhanced ingest endpoint to handle multiple files from React frontend
+    Enhanced ingest endpoint to handle multiple files from React frontend.
+    `collection` selects the target collection; `shards` only applies when it is created.
     """
+    try:
+        coll = Collection(collection, embedding_fn=get_embedding_fn(), num_shards=shards)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
     results = []
     total_chunks = 0
     
@@ -82,22 +144,21 @@ async def ingest(files: List[UploadFile] = File(...), title: str = Form(None)):
         document_id = str(uuid.uuid4())
         file_title = title or name
         
-        # Insert document metadata
-        insert_document({
+        # Chunk and vectorize text
+        chunks = chunk_text(text, max_tokens=300, overlap_tokens=40)
+        rows = attach_metadata(chunks, document_id=document_id, title=file_title, source_uri=name)
+        with priority("background"):
+            embs = await run_in_threadpool(coll.embed_chunks, rows)
+
+        # Lock waits and disk writes stay off the event loop
+        await run_in_threadpool(_store_document, coll, {
             "id": document_id,
             "title": file_title,
             "source_uri": name,
             "created_at": datetime.datetime.utcnow().isoformat(),
             "tags": "",
-        })
-        
-        # Chunk and vectorize text
-        chunks = chunk_text(text, max_tokens=300, overlap_tokens=40)
-        rows = attach_metadata(chunks, document_id=document_id, title=file_title, source_uri=name)
-
-        vs = VectorStore(embedding_fn=get_embedding_fn())
-        vs.add_chunks(rows)
-        insert_chunks(rows)
+            "collection": coll.name,
+        }, rows, embs)
         
         results.append({
             "document_id": document_id,
@@ -114,6 +175,13 @@ async def ingest(files: List[UploadFile] = File(...), title: str = Form(None)):
         "message": f"Successfully processed {len(files)} file(s)"
     }
 
+def _store_document(coll: Collection, doc: dict, rows: list, embs) -> None:
+    """Write vectors and metadata together so snapshots never see half a document"""
+    with store_lock.write():
+        insert_document(doc)
+        coll.add_chunks(doc["id"], rows, embs)
+        insert_chunks(rows)
+
 @app.get("/docs/{doc_id}", dependencies=[Depends(require_auth)])
 def get_doc(doc_id: str):
     """Get document metadata and chunk preview"""
@@ -134,31 +202,37 @@ def list_documents():
     except Exception as e:
         return {"documents": [], "error": str(e)}
 
+@app.get("/collections", dependencies=[Depends(require_auth)])
+def get_collections():
+    """List collections and their shard counts"""
+    return {"collections": [
+        {"name": name, "num_shards": Collection(name, embedding_fn=None).num_shards}
+        for name in list_collections()
+    ]}
+
 @app.post("/query", response_model=AnswerResponse, dependencies=[Depends(require_auth)])
 def query(req: QueryRequest):
     """
     Enhanced query endpoint with better error handling for React frontend
     """
     try:
-        if req.mode == "form":
-            res = run_form_pipeline(req.question, req.user_context)
-            if "form_type" in res:
-                return AnswerResponse(
-                    answer=f"Generated form `{res['form_type']}` (requires approval).",
-                    citations=[],
-                    metrics={
-                        "form_type": res["form_type"], 
-                        "requires_approval": res["requires_approval"],
-                        "processing_time": res.get("processing_time", 0)
-                    }
-                )
-        
-        res = run_answer_pipeline(req.question, top_k=req.top_k)
+        collection = validate_name(req.collection)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    key = (
+        normalize_question(req.question), req.top_k, req.mode, collection, store_lock.version,
+        json.dumps(req.user_context, sort_keys=True, default=str) if req.mode == "form" else None,
+    )
+    try:
+        res, coalesced = query_flight.do(key, lambda: _run_query(req, collection))
         return AnswerResponse(
-            answer=res["answer"], 
-            citations=res["citations"], 
-            metrics=res["metrics"]
+            answer=res["answer"],
+            citations=res["citations"],
+            metrics={**res["metrics"], "coalesced": coalesced}
         )
+    except (Overloaded, APIError):
+        raise
     except Exception as e:
         return AnswerResponse(
             answer=f"Error processing query: {str(e)}",
@@ -166,17 +240,84 @@ def query(req: QueryRequest):
             metrics={"error": True, "error_message": str(e)}
         )
 
+def _run_query(req: QueryRequest, collection: str) -> dict:
+    """One pipeline execution, shared by all identical in-flight /query requests"""
+    if req.mode == "form":
+        res = run_form_pipeline(req.question, req.user_context, collection=collection)
+        if "form_type" in res:
+            return {
+                "answer": f"Generated form `{res['form_type']}` (requires approval).",
+                "citations": [],
+                "metrics": {
+                    "form_type": res["form_type"], 
+                    "requires_approval": res["requires_approval"],
+                    "processing_time": res.get("processing_time", 0)
+                }
+            }
+    return run_answer_pipeline(req.question, top_k=req.top_k, collection=collection)
+
+@app.get("/metrics", dependencies=[Depends(require_auth)])
+async def metrics():
+    """Runtime counters for capacity planning"""
+    return {
+        "corpus_version": store_lock.version,
+        "query_coalescing": dict(query_flight.stats),
+        "admission": {
+            "chat": chat_limiter.snapshot(),
+            "embedding": embedding_limiter.snapshot(),
+            "threadpool_size": anyio.to_thread.current_default_thread_limiter().total_tokens,
+        },
+        "search_workers": settings.SEARCH_WORKERS,
+    }
+
+@app.get("/snapshot/export", dependencies=[Depends(require_auth)])
+def snapshot_export():
+    """Download a consistent, checksummed snapshot of documents, chunks, and vectors"""
+    fd, path = tempfile.mkstemp(suffix=".jsonl.gz", dir=settings.STORAGE_DIR)
+    os.close(fd)
+    try:
+        info = export_snapshot(path)
+    except Exception:
+        os.remove(path)
+        raise
+    return FileResponse(
+        path,
+        media_type="application/gzip",
+        filename="policy-qa-snapshot.jsonl.gz",
+        headers={"X-Snapshot-SHA256": info["sha256"]},
+        background=BackgroundTask(os.remove, path),
+    )
+
+@app.post("/snapshot/import", dependencies=[Depends(require_auth)])
+async def snapshot_import(file: UploadFile = File(...), replace: bool = Form(False)):
+    """Bulk-load a snapshot produced by /snapshot/export (no embedding calls)"""
+    fd, path = tempfile.mkstemp(suffix=".jsonl.gz", dir=settings.STORAGE_DIR)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            while chunk := await file.read(1 << 20):
+                f.write(chunk)
+        return await run_in_threadpool(import_snapshot, path, replace=replace)
+    except StoreNotEmpty as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except SnapshotError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    finally:
+        os.remove(path)
+
 @app.post("/eval/run", dependencies=[Depends(require_auth)])
 def run_eval():
     """Run evaluation suite"""
     try:
         from evals.runner import run_all as _run
-        result = _run()
+        with priority("background"):
+            result = _run()
         return {
             "status": "completed",
             "results": result,
             "timestamp": datetime.datetime.utcnow().isoformat()
         }
+    except (Overloaded, APIError):
+        raise
     except Exception as e:
         return {
             "status": "failed",
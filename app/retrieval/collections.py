@@ -0,0 +1,106 @@
+import os, re, json, zlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Optional
+
+from ..config import settings
+from ..utils.locks import store_lock
+from .vectorstore import VectorStore, INDEX_PATH, MAP_PATH, embed_texts, embed_query, attach_chunk_rows
+
+COLLECTIONS_DIR = os.path.join(settings.STORAGE_DIR, "collections")
+_NAME_RE = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+# FAISS releases the GIL during search, so shard fan-out runs truly in parallel.
+# The pool is shared by all requests: size SEARCH_WORKERS to concurrent queries x (shards - 1).
+_search_pool = ThreadPoolExecutor(max_workers=settings.SEARCH_WORKERS, thread_name_prefix="shard-search")
+
+def validate_name(name: Optional[str]) -> str:
+    name = name or settings.DEFAULT_COLLECTION
+    if not _NAME_RE.match(name):
+        raise ValueError(f"Invalid collection name: {name!r}")
+    return name
+
+def shard_for(document_id: str, num_shards: int) -> int:
+    """Stable hash placement so all chunks of a document land in one shard."""
+    return zlib.crc32(document_id.encode("utf-8")) % num_shards
+
+class Collection:
+    """A named set of FAISS shards. The default collection's first shard keeps
+    the legacy `index.faiss` / `chunk_map.json` paths so existing stores load as-is."""
+
+    def __init__(self, name: Optional[str], embedding_fn, num_shards: Optional[int] = None):
+        self.name = validate_name(name)
+        self.embedding_fn = embedding_fn
+        self.dir = os.path.join(COLLECTIONS_DIR, self.name)
+        self.manifest_path = os.path.join(self.dir, "collection.json")
+        manifest = self._read_manifest()
+        if manifest:
+            self.num_shards = int(manifest["num_shards"])
+        else:
+            self.num_shards = max(1, int(num_shards or settings.DEFAULT_SHARDS))
+
+    def _read_manifest(self) -> Optional[Dict[str, Any]]:
+        if not os.path.exists(self.manifest_path):
+            return None
+        with open(self.manifest_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def write_manifest(self):
+        os.makedirs(self.dir, exist_ok=True)
+        with open(self.manifest_path, "w", encoding="utf-8") as f:
+            json.dump({"name": self.name, "num_shards": self.num_shards}, f)
+
+    def exists(self) -> bool:
+        return os.path.exists(self.manifest_path) or (
+            self.name == settings.DEFAULT_COLLECTION and os.path.exists(INDEX_PATH)
+        )
+
+    def shard_paths(self, shard: int) -> tuple[str, str]:
+        if self.name == settings.DEFAULT_COLLECTION and shard == 0:
+            return INDEX_PATH, MAP_PATH
+        return (
+            os.path.join(self.dir, f"shard_{shard}.faiss"),
+            os.path.join(self.dir, f"shard_{shard}.json"),
+        )
+
+    def shard(self, shard: int) -> VectorStore:
+        index_path, map_path = self.shard_paths(shard)
+        return VectorStore(embedding_fn=self.embedding_fn, index_path=index_path, map_path=map_path)
+
+    def add_chunks(self, document_id: str, rows: List[Dict[str, Any]], embs=None) -> int:
+        """Add one document's chunks to its hash shard; returns the shard number.
+        Callers holding `store_lock` should pass `embs` from `embed_chunks` computed outside it."""
+        # Another writer may have created the collection since __init__; its shard count wins.
+        manifest = self._read_manifest()
+        if manifest:
+            self.num_shards = int(manifest["num_shards"])
+        else:
+            self.write_manifest()
+        shard = shard_for(document_id, self.num_shards)
+        self.shard(shard).add_chunks(rows, embs)
+        for r in rows:
+            r["shard"] = shard
+        return shard
+
+    def embed_chunks(self, rows: List[Dict[str, Any]]):
+        return embed_texts(self.embedding_fn, [r["text"] for r in rows])
+
+    def search(self, query: str, k: int = 5) -> List[Dict[str, Any]]:
+        if not self.exists():
+            return []
+        # Embed once, then fan the vector out to every shard.
+        q = embed_query(self.embedding_fn, query)
+        with store_lock.read():
+            # Shard 0 runs on the request thread, so the pool only carries the other shards.
+            futures = [_search_pool.submit(lambda s: self.shard(s).search_vector(q, k), s) for s in range(1, self.num_shards)]
+            hits = self.shard(0).search_vector(q, k)
+            hits += [h for f in futures for h in f.result()]
+        hits.sort(key=lambda h: h[1], reverse=True)
+        return attach_chunk_rows([{"chunk_id": cid, "score": score} for cid, score in hits[:k]])
+
+def list_collections() -> List[str]:
+    names = set()
+    if os.path.isdir(COLLECTIONS_DIR):
+        names.update(n for n in os.listdir(COLLECTIONS_DIR) if _NAME_RE.match(n))
+    if os.path.exists(INDEX_PATH):
+        names.add(settings.DEFAULT_COLLECTION)
+    return sorted(names)
@@ -0,0 +1,277 @@
+"""Checksummed, gzip-compressed corpus snapshots for bootstrapping replicas.
+
+A snapshot is a JSON-lines stream: a header, then collections, documents, chunks,
+and per-shard vector batches, closed by an `end` record holding the SHA-256 of
+every preceding line. Import verifies the checksum and record structure, bulk-loads
+vectors into a staging area (no embedding calls), and only then swaps it in.
+
+    python -m app.retrieval.snapshot export storage/snapshot.jsonl.gz
+    python -m app.retrieval.snapshot import storage/snapshot.jsonl.gz --replace
+"""
+import os, json, gzip, zlib, base64, binascii, hashlib, shutil, sqlite3, tempfile, datetime, argparse
+from typing import Dict, Any, Iterator, List
+import numpy as np
+import faiss
+
+from .. import db
+from ..db import init_db, iter_rows, insert_documents, insert_chunks, count_documents
+from ..utils.locks import store_lock
+from .vectorstore import VectorStore, INDEX_PATH, MAP_PATH
+from . import collections as colls
+
+FORMAT = "policy-qa-snapshot"
+VERSION = 1
+BATCH_SIZE = 1024
+
+class SnapshotError(ValueError):
+    pass
+
+class StoreNotEmpty(SnapshotError):
+    pass
+
+NOT_EMPTY_MESSAGE = "Store is not empty; pass replace=true (CLI: --replace) to overwrite it"
+
+class _Writer:
+    def __init__(self, f):
+        self.f = f
+        self.sha = hashlib.sha256()
+        self.records = 0
+
+    def write(self, record: Dict[str, Any]):
+        line = (json.dumps(record, separators=(",", ":")) + "\n").encode("utf-8")
+        self.sha.update(line)
+        self.f.write(line)
+        self.records += 1
+
+def _shard_records(name: str, shard: int) -> Iterator[Dict[str, Any]]:
+    index_path, map_path = colls.Collection(name, embedding_fn=None).shard_paths(shard)
+    vs = VectorStore(embedding_fn=None, index_path=index_path, map_path=map_path)
+    if vs.index is None:
+        return
+    yield {"type": "shard", "collection": name, "shard": shard, "dim": vs.index.d, "ntotal": vs.index.ntotal}
+    for start in range(0, vs.index.ntotal, BATCH_SIZE):
+        n = min(BATCH_SIZE, vs.index.ntotal - start)
+        vecs = vs.index.reconstruct_n(start, n).astype("float32")
+        yield {
+            "type": "vectors", "collection": name, "shard": shard,
+            "ids": vs.id_map[start:start + n],
+            "data": base64.b64encode(vecs.tobytes()).decode("ascii"),
+        }
+
+def export_snapshot(path: str) -> Dict[str, Any]:
+    """Write a consistent snapshot of the whole store to `path` under the read lock."""
+    tmp = path + ".tmp"
+    try:
+        info = _write_snapshot(tmp)
+    except Exception:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+    os.replace(tmp, path)
+    return {"path": path, **info, "bytes": os.path.getsize(path)}
+
+def _write_snapshot(tmp: str) -> Dict[str, Any]:
+    with store_lock.read(), gzip.open(tmp, "wb") as f:
+        w = _Writer(f)
+        w.write({"type": "header", "format": FORMAT, "version": VERSION,
+                 "created_at": datetime.datetime.utcnow().isoformat()})
+        names = colls.list_collections()
+        for name in names:
+            w.write({"type": "collection", "name": name,
+                     "num_shards": colls.Collection(name, embedding_fn=None).num_shards})
+        for row in iter_rows("documents"):
+            w.write({"type": "document", **row})
+        for row in iter_rows("chunks"):
+            w.write({"type": "chunk", **row})
+        for name in names:
+            for shard in range(colls.Collection(name, embedding_fn=None).num_shards):
+                for rec in _shard_records(name, shard):
+                    w.write(rec)
+        checksum = w.sha.hexdigest()
+        f.write((json.dumps({"type": "end", "records": w.records, "sha256": checksum}) + "\n").encode("utf-8"))
+    return {"records": w.records, "sha256": checksum}
+
+def _read_records(path: str) -> Iterator[Dict[str, Any]]:
+    with gzip.open(path, "rb") as f:
+        for line in f:
+            yield json.loads(line)
+
+# Records must appear in this order; vectors must follow their shard record.
+_PHASES = {"header": 0, "collection": 1, "document": 2, "chunk": 3, "shard": 4, "vectors": 4}
+
+class _Structure:
+    def __init__(self):
+        self.phase = -1
+        self.collections: Dict[str, int] = {}
+        self.shard: tuple | None = None
+
+    def check(self, rec: Dict[str, Any]):
+        kind = rec.get("type")
+        if kind not in _PHASES:
+            raise SnapshotError(f"Unknown record type: {kind!r}")
+        if self.phase < 0:
+            if kind != "header" or rec.get("format") != FORMAT:
+                raise SnapshotError("Not a policy-qa snapshot")
+            if rec.get("version") != VERSION:
+                raise SnapshotError(f"Unsupported snapshot version: {rec.get('version')!r}")
+        elif kind == "header" or _PHASES[kind] < self.phase:
+            raise SnapshotError(f"Out-of-order {kind} record")
+        self.phase = _PHASES[kind]
+
+        if kind == "collection":
+            name = colls.validate_name(rec["name"])
+            if not isinstance(rec["num_shards"], int) or rec["num_shards"] < 1:
+                raise SnapshotError(f"Invalid shard count for collection {name}")
+            self.collections[name] = rec["num_shards"]
+        elif kind in ("document", "chunk"):
+            if not isinstance(rec["id"], str):
+                raise SnapshotError(f"Invalid {kind} id")
+        elif kind == "shard":
+            n = self.collections.get(rec["collection"])
+            if n is None or not isinstance(rec["shard"], int) or not 0 <= rec["shard"] < n:
+                raise SnapshotError(f"Shard record for unknown shard {rec['collection']}/{rec['shard']}")
+            if not isinstance(rec["dim"], int) or rec["dim"] < 1:
+                raise SnapshotError("Invalid vector dimension")
+            self.shard = (rec["collection"], rec["shard"], rec["dim"])
+        elif kind == "vectors":
+            if self.shard is None or self.shard[:2] != (rec["collection"], rec["shard"]):
+                raise SnapshotError("Vectors record without a matching shard record")
+            if len(base64.b64decode(rec["data"])) != len(rec["ids"]) * self.shard[2] * 4:
+                raise SnapshotError("Vector batch size does not match its ids and dimension")
+
+def verify_snapshot(path: str) -> Dict[str, Any]:
+    """Stream the snapshot once, checking header, version, record order, and checksum."""
+    sha = hashlib.sha256()
+    structure = _Structure()
+    records = 0
+    end = None
+    try:
+        with gzip.open(path, "rb") as f:
+            for line in f:
+                rec = json.loads(line)
+                if isinstance(rec, dict) and rec.get("type") == "end" and records:
+                    end = rec
+                    break
+                if not isinstance(rec, dict):
+                    raise SnapshotError("Malformed record")
+                structure.check(rec)
+                sha.update(line)
+                records += 1
+    except SnapshotError:
+        raise
+    except (OSError, EOFError, zlib.error, json.JSONDecodeError) as e:
+        raise SnapshotError(f"Unreadable snapshot: {e}")
+    except (KeyError, TypeError, ValueError, binascii.Error) as e:
+        raise SnapshotError(f"Malformed record: {e!r}")
+    if end is None:
+        raise SnapshotError("Snapshot is truncated (no end record)")
+    if end.get("records") != records or end.get("sha256") != sha.hexdigest():
+        raise SnapshotError("Snapshot checksum mismatch")
+    return {"records": records, "sha256": end["sha256"]}
+
+def _staged(path: str, staging: str) -> str:
+    """Where a live vector-store path is built inside the staging directory."""
+    if path == INDEX_PATH:
+        return os.path.join(staging, "index.faiss")
+    if path == MAP_PATH:
+        return os.path.join(staging, "chunk_map.json")
+    return os.path.join(staging, "collections", os.path.relpath(path, colls.COLLECTIONS_DIR))
+
+def _load_staging(path: str, staging: str) -> Dict[str, int]:
+    db_path = os.path.join(staging, "meta.db")
+    init_db(db_path)
+    counts = {"documents": 0, "chunks": 0, "vectors": 0}
+    docs: List[Dict[str, Any]] = []
+    chunks: List[Dict[str, Any]] = []
+    shard: VectorStore | None = None
+
+    def flush():
+        if docs:
+            insert_documents(docs, db_path); docs.clear()
+        if chunks:
+            insert_chunks(chunks, db_path); chunks.clear()
+
+    for rec in _read_records(path):
+        kind = rec.pop("type")
+        if kind == "collection":
+            manifest = _staged(colls.Collection(rec["name"], embedding_fn=None).manifest_path, staging)
+            os.makedirs(os.path.dirname(manifest), exist_ok=True)
+            with open(manifest, "w", encoding="utf-8") as f:
+                json.dump({"name": rec["name"], "num_shards": rec["num_shards"]}, f)
+        elif kind == "document":
+            docs.append(rec); counts["documents"] += 1
+        elif kind == "chunk":
+            chunks.append(rec); counts["chunks"] += 1
+        elif kind == "shard":
+            if shard is not None:
+                shard._save()
+            index_path, map_path = colls.Collection(rec["collection"], embedding_fn=None).shard_paths(rec["shard"])
+            shard = VectorStore(embedding_fn=None, index_path=_staged(index_path, staging), map_path=_staged(map_path, staging))
+            shard.index = faiss.IndexFlatIP(rec["dim"])
+        elif kind == "vectors":
+            vecs = np.frombuffer(base64.b64decode(rec["data"]), dtype="float32").reshape(len(rec["ids"]), shard.index.d)
+            shard.index.add(vecs)
+            shard.id_map.extend(rec["ids"])
+            counts["vectors"] += len(rec["ids"])
+        elif kind == "end":
+            break
+        if len(docs) + len(chunks) >= BATCH_SIZE:
+            flush()
+    flush()
+    if shard is not None:
+        shard._save()
+    return counts
+
+def _swap_in(staging: str):
+    """Replace the live store with the staged one; caller holds the write lock."""
+    replaced = os.path.join(staging, "replaced")
+    os.makedirs(replaced)
+    for live, name in ((colls.COLLECTIONS_DIR, "collections"), (INDEX_PATH, "index.faiss"), (MAP_PATH, "chunk_map.json")):
+        if os.path.exists(live):
+            os.replace(live, os.path.join(replaced, name))
+        if os.path.exists(os.path.join(staging, name)):
+            os.replace(os.path.join(staging, name), live)
+    os.replace(os.path.join(staging, "meta.db"), db.DB_PATH)
+
+def import_snapshot(path: str, replace: bool = False) -> Dict[str, Any]:
+    """Load a verified snapshot into a staging area, then swap it in under the write lock.
+
+    Refuses to overwrite a non-empty store unless `replace`. A failed load leaves
+    the live store untouched.
+    """
+    info = verify_snapshot(path)
+    init_db()
+    if count_documents() and not replace:
+        raise StoreNotEmpty(NOT_EMPTY_MESSAGE)
+    staging = tempfile.mkdtemp(prefix=".import-", dir=os.path.dirname(os.path.abspath(db.DB_PATH)))
+    try:
+        try:
+            counts = _load_staging(path, staging)
+        except sqlite3.IntegrityError as e:
+            raise SnapshotError(f"Snapshot contains duplicate rows: {e}")
+        with store_lock.write():
+            if count_documents() and not replace:
+                raise StoreNotEmpty(NOT_EMPTY_MESSAGE)
+            _swap_in(staging)
+    finally:
+        shutil.rmtree(staging, ignore_errors=True)
+    return {**info, **counts}
+
+def main(argv: List[str] | None = None):
+    parser = argparse.ArgumentParser(prog="python -m app.retrieval.snapshot", description="Export or import a corpus snapshot")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    sub.add_parser("export").add_argument("path")
+    imp = sub.add_parser("import")
+    imp.add_argument("path")
+    imp.add_argument("--replace", action="store_true", help="overwrite a non-empty store")
+    args = parser.parse_args(argv)
+    try:
+        if args.cmd == "export":
+            print(json.dumps(export_snapshot(args.path)))
+        else:
+            print(json.dumps(import_snapshot(args.path, replace=args.replace)))
+    except SnapshotError as e:
+        parser.error(str(e))
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,5 @@
 import os, json, numpy as np
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Tuple
 import faiss
 
 from ..config import settings
@@ -9,31 +9,33 @@ INDEX_PATH = os.path.join(settings.STORAGE_DIR, "index.faiss")
 MAP_PATH = os.path.join(settings.STORAGE_DIR, "chunk_map.json")
 
 class VectorStore:
-    def __init__(self, embedding_fn):
+    def __init__(self, embedding_fn, index_path: str = INDEX_PATH, map_path: str = MAP_PATH):
         self.embedding_fn = embedding_fn
+        self.index_path = index_path
+        self.map_path = map_path
         self.index = None
         self.id_map: List[str] = []
-        if os.path.exists(INDEX_PATH) and os.path.exists(MAP_PATH):
+        if os.path.exists(self.index_path) and os.path.exists(self.map_path):
             self._load()
 
     def _save(self):
-        faiss.write_index(self.index, INDEX_PATH)
-        with open(MAP_PATH, "w", encoding="utf-8") as f:
+        os.makedirs(os.path.dirname(self.index_path) or ".", exist_ok=True)
+        faiss.write_index(self.index, self.index_path)
+        with open(self.map_path, "w", encoding="utf-8") as f:
             json.dump(self.id_map, f)
 
     def _load(self):
-        self.index = faiss.read_index(INDEX_PATH)
-        with open(MAP_PATH, "r", encoding="utf-8") as f:
+        self.index = faiss.read_index(self.index_path)
+        with open(self.map_path, "r", encoding="utf-8") as f:
             self.id_map = json.load(f)
 
     def _ensure(self, dim: int):
         if self.index is None:
             self.index = faiss.IndexFlatIP(dim)
 
-    def add_chunks(self, rows: List[Dict[str, Any]]) -> List[int]:
-        texts = [r["text"] for r in rows]
-        embs = np.array(self.embedding_fn(texts), dtype="float32")
-        faiss.normalize_L2(embs)
+    def add_chunks(self, rows: List[Dict[str, Any]], embs: np.ndarray | None = None) -> List[int]:
+        if embs is None:
+            embs = embed_texts(self.embedding_fn, [r["text"] for r in rows])
         self._ensure(embs.shape[1])
         start_id = len(self.id_map)
         self.index.add(embs)
@@ -43,21 +45,36 @@ class VectorStore:
         self._save()
         return list(range(start_id, start_id + len(rows)))
 
-    def search(self, query: str, k: int = 5) -> List[Dict[str, Any]]:
+    def search_vector(self, q: np.ndarray, k: int = 5) -> List[Tuple[str, float]]:
+        """Raw (chunk_id, score) hits for an already-normalized query vector."""
         if self.index is None or len(self.id_map) == 0:
             return []
-        q = np.array(self.embedding_fn([query]), dtype="float32")
-        faiss.normalize_L2(q)
         D, I = self.index.search(q, k)
         out = []
         for score, idx in zip(D[0].tolist(), I[0].tolist()):
             if idx == -1: continue
-            chunk_id = self.id_map[idx]
-            out.append({"chunk_id": chunk_id, "score": float(score)})
-        chunk_rows = get_chunks_by_ids([o["chunk_id"] for o in out])
-        row_map = {r["id"]: r for r in chunk_rows}
-        for o in out:
-            r = row_map.get(o["chunk_id"])
-            if r:
-                o.update(r)
+            out.append((self.id_map[idx], float(score)))
         return out
+
+    def search(self, query: str, k: int = 5) -> List[Dict[str, Any]]:
+        if self.index is None or len(self.id_map) == 0:
+            return []
+        hits = self.search_vector(embed_query(self.embedding_fn, query), k)
+        return attach_chunk_rows([{"chunk_id": cid, "score": score} for cid, score in hits])
+
+def embed_texts(embedding_fn, texts: List[str]) -> np.ndarray:
+    embs = np.array(embedding_fn(texts), dtype="float32")
+    faiss.normalize_L2(embs)
+    return embs
+
+def embed_query(embedding_fn, query: str) -> np.ndarray:
+    return embed_texts(embedding_fn, [query])
+
+def attach_chunk_rows(out: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    chunk_rows = get_chunks_by_ids([o["chunk_id"] for o in out])
+    row_map = {r["id"]: r for r in chunk_rows}
+    for o in out:
+        r = row_map.get(o["chunk_id"])
+        if r:
+            o.update(r)
+    return out
@@ -28,6 +28,7 @@ class QueryRequest(BaseModel):
     question: str
     mode: Optional[str] = "chat"  # "chat" or "form"
     top_k: Optional[int] = 5
+    collection: Optional[str] = None  # defaults to settings.DEFAULT_COLLECTION
     user_context: Optional[Dict[str, Any]] = None
     include_metadata: Optional[bool] = True
 
@@ -44,6 +45,7 @@ class DocumentInfo(BaseModel):
     source_uri: str
     created_at: str
     tags: str
+    collection: Optional[str] = None
     num_chunks: Optional[int] = None
 
 class DocumentResponse(BaseModel):
@@ -0,0 +1,117 @@
+import heapq, itertools, math, threading, time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict
+
+PRIORITIES = {"interactive": 0, "background": 1}
+current_priority: ContextVar[str] = ContextVar("admission_priority", default="interactive")
+
+@contextmanager
+def priority(name: str):
+    """Run upstream calls made in this context at `name` priority."""
+    if name not in PRIORITIES:
+        raise ValueError(f"Unknown priority: {name}")
+    token = current_priority.set(name)
+    try:
+        yield
+    finally:
+        current_priority.reset(token)
+
+class Overloaded(Exception):
+    """Raised when a call cannot be admitted within its queue budget."""
+
+    def __init__(self, limiter: str, status_code: int, retry_after: int, reason: str):
+        super().__init__(f"{limiter} capacity exhausted: {reason}")
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+class AdmissionController:
+    """Concurrency limiter with a bounded, priority-ordered wait queue.
+
+    At most `limit` calls run at once. Others queue, interactive ahead of
+    background, and give up once they have waited longer than their priority's
+    budget (503) or immediately when `max_queue` callers of the same priority are
+    already waiting (429). Each priority has its own cap, so a background burst
+    cannot crowd interactive calls out of the queue.
+    """
+
+    def __init__(self, name: str, limit: int, max_queue: int, max_wait_s: Dict[str, float]):
+        self.name = name
+        self.limit = max(1, limit)
+        self.max_queue = max_queue
+        self.max_wait_s = max_wait_s
+        self._cond = threading.Condition()
+        self._active = 0
+        self._waiting: list = []
+        self._queued = {p: 0 for p in PRIORITIES}
+        self._seq = itertools.count()
+        self._avg_hold_s = 1.0
+        self.stats = {"admitted": 0, "rejected_queue_full": 0, "rejected_timeout": 0,
+                      "wait_ms_total": 0.0, "wait_ms_max": 0.0}
+
+    def _retry_after(self) -> int:
+        backlog = len(self._waiting) + 1
+        return max(1, math.ceil(self._avg_hold_s * backlog / self.limit))
+
+    def acquire(self, prio: str | None = None):
+        prio = prio or current_priority.get()
+        start = time.monotonic()
+        with self._cond:
+            if self._active < self.limit and not self._waiting:
+                self._admit(start)
+                return
+            if self._queued[prio] >= self.max_queue:
+                self.stats["rejected_queue_full"] += 1
+                raise Overloaded(self.name, 429, self._retry_after(), "queue full")
+            ticket = (PRIORITIES[prio], next(self._seq))
+            heapq.heappush(self._waiting, ticket)
+            self._queued[prio] += 1
+            deadline = start + self.max_wait_s[prio]
+            while not (self._waiting[0] is ticket and self._active < self.limit):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._waiting.remove(ticket)
+                    heapq.heapify(self._waiting)
+                    self._queued[prio] -= 1
+                    self.stats["rejected_timeout"] += 1
+                    self._cond.notify_all()
+                    raise Overloaded(self.name, 503, self._retry_after(), "queue wait budget exceeded")
+                self._cond.wait(remaining)
+            heapq.heappop(self._waiting)
+            self._queued[prio] -= 1
+            self._admit(start)
+            self._cond.notify_all()
+
+    def _admit(self, start: float):
+        self._active += 1
+        waited_ms = (time.monotonic() - start) * 1000
+        self.stats["admitted"] += 1
+        self.stats["wait_ms_total"] += waited_ms
+        self.stats["wait_ms_max"] = max(self.stats["wait_ms_max"], waited_ms)
+
+    def release(self, held_s: float):
+        with self._cond:
+            self._active -= 1
+            self._avg_hold_s = 0.8 * self._avg_hold_s + 0.2 * held_s
+            self._cond.notify_all()
+
+    @contextmanager
+    def slot(self, prio: str | None = None):
+        self.acquire(prio)
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.release(time.monotonic() - start)
+
+    def snapshot(self) -> Dict[str, float]:
+        with self._cond:
+            admitted = self.stats["admitted"]
+            return {
+                **self.stats,
+                "limit": self.limit,
+                "in_flight": self._active,
+                "queue_depth": len(self._waiting),
+                "queue_depth_by_priority": dict(self._queued),
+                "wait_ms_avg": self.stats["wait_ms_total"] / admitted if admitted else 0.0,
+            }
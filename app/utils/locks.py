@@ -0,0 +1,74 @@
+import os, threading
+from contextlib import contextmanager
+
+from ..config import settings
+
+try:
+    import fcntl
+except ImportError:  # non-POSIX: fall back to in-process locking only
+    fcntl = None
+
+class RWLock:
+    """Writer-preferring reader/writer lock guarding the on-disk store.
+
+    Threads coordinate through a condition variable; when `path` is set, holders
+    also take a shared/exclusive `flock` on it so separate processes (e.g. the
+    snapshot CLI next to a running server) exclude each other too.
+    `version` increases after every write, so it doubles as a corpus version.
+    """
+
+    def __init__(self, path: str | None = None):
+        self.path = path
+        self._cond = threading.Condition()
+        self._readers = 0
+        self._writer = False
+        self._waiting_writers = 0
+        self.version = 0
+
+    @contextmanager
+    def _file_lock(self, exclusive: bool):
+        if fcntl is None or not self.path:
+            yield
+            return
+        # One open file description per holder, so flock arbitrates between threads as well
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            yield
+        finally:
+            os.close(fd)
+
+    @contextmanager
+    def read(self):
+        with self._cond:
+            while self._writer or self._waiting_writers:
+                self._cond.wait()
+            self._readers += 1
+        try:
+            with self._file_lock(exclusive=False):
+                yield
+        finally:
+            with self._cond:
+                self._readers -= 1
+                if self._readers == 0:
+                    self._cond.notify_all()
+
+    @contextmanager
+    def write(self):
+        with self._cond:
+            self._waiting_writers += 1
+            while self._writer or self._readers:
+                self._cond.wait()
+            self._waiting_writers -= 1
+            self._writer = True
+        try:
+            with self._file_lock(exclusive=True):
+                yield
+        finally:
+            with self._cond:
+                self._writer = False
+                self.version += 1
+                self._cond.notify_all()
+
+# Shared by ingest, search, and snapshot export/import, in this and other processes.
+store_lock = RWLock(os.path.join(settings.STORAGE_DIR, ".store.lock"))
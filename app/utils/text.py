@@ -4,3 +4,6 @@ def truncate(s: str, n: int = 350) -> str:
 
 def needs_refusal(similarity_floor: float, coverage_tokens: int, min_floor: float = 0.18, min_coverage: int = 80) -> bool:
     return similarity_floor < min_floor or coverage_tokens < min_coverage
+
+def normalize_question(q: str) -> str:
+    return " ".join(q.lower().split())
@@ -0,0 +1,70 @@
+import threading, time
+import pytest
+from app.utils.admission import AdmissionController, Overloaded, priority
+
+def _limiter(**kw):
+    return AdmissionController("chat", limit=1, max_queue=kw.get("max_queue", 4),
+                               max_wait_s={"interactive": 2.0, "background": kw.get("background_wait", 2.0)})
+
+def test_wait_budget_exceeded_returns_503_with_retry_after():
+    lim = _limiter(background_wait=0.05)
+    lim.acquire()
+    with priority("background"), pytest.raises(Overloaded) as exc:
+        lim.acquire()
+    assert exc.value.status_code == 503 and exc.value.retry_after >= 1
+    assert lim.snapshot()["rejected_timeout"] == 1
+    assert lim.snapshot()["queue_depth"] == 0
+
+def test_full_queue_rejects_immediately_with_429():
+    lim = _limiter(max_queue=0)
+    lim.acquire()
+    with pytest.raises(Overloaded) as exc:
+        lim.acquire()
+    assert exc.value.status_code == 429
+
+def test_interactive_is_admitted_before_background():
+    lim = _limiter()
+    lim.acquire()
+    order = []
+
+    def waiter(prio):
+        with lim.slot(prio):
+            order.append(prio)
+
+    bg = threading.Thread(target=waiter, args=("background",))
+    bg.start()
+    while lim.snapshot()["queue_depth"] < 1:
+        time.sleep(0.01)
+    fg = threading.Thread(target=waiter, args=("interactive",))
+    fg.start()
+    while lim.snapshot()["queue_depth"] < 2:
+        time.sleep(0.01)
+    lim.release(0.01)
+    bg.join(2); fg.join(2)
+    assert order == ["interactive", "background"]
+    assert lim.snapshot()["in_flight"] == 0 and lim.snapshot()["admitted"] == 3
+
+def test_background_burst_does_not_reject_interactive():
+    lim = _limiter(max_queue=1, background_wait=2.0)
+    lim.acquire()
+    bg = threading.Thread(target=lim.acquire, args=("background",))
+    bg.start()
+    while lim.snapshot()["queue_depth"] < 1:
+        time.sleep(0.01)
+    with pytest.raises(Overloaded) as exc:
+        lim.acquire("background")
+    assert exc.value.status_code == 429
+
+    admitted = threading.Event()
+    def interactive():
+        lim.acquire("interactive")
+        admitted.set()
+    fg = threading.Thread(target=interactive)
+    fg.start()
+    while lim.snapshot()["queue_depth_by_priority"]["interactive"] < 1:
+        time.sleep(0.01)
+    lim.release(0.01)
+    assert admitted.wait(2)
+    assert lim.snapshot()["queue_depth_by_priority"] == {"interactive": 0, "background": 1}
+    lim.release(0.01)
+    bg.join(2); fg.join(2)
@@ -6,3 +6,14 @@ client = TestClient(app)
 def test_docs():
     r = client.get("/docs/nonexistent", headers={"X-API-Key":"dev-secret"})
     assert r.status_code == 200
+
+def test_upstream_timeout_is_503_not_an_answer(monkeypatch):
+    import httpx, openai
+    import app.main as main
+    monkeypatch.setenv("APP_SECRET", "dev-secret")
+    def timeout(*args, **kwargs):
+        raise openai.APITimeoutError(request=httpx.Request("POST", "https://api.openai.com/v1/chat/completions"))
+    monkeypatch.setattr(main, "run_answer_pipeline", timeout)
+    r = client.post("/query", json={"question": "vpn policy?"}, headers={"X-API-Key": "dev-secret"})
+    assert r.status_code == 503
+    assert r.headers["Retry-After"] == "5"
@@ -0,0 +1,28 @@
+import fcntl, os, threading
+from app.utils.locks import RWLock
+
+def test_store_lock_waits_for_other_process_holder(tmp_path):
+    path = str(tmp_path / ".store.lock")
+    lock = RWLock(path)
+
+    # A separate open file description behaves like another process holding the write lock
+    fd = os.open(path, os.O_RDWR | os.O_CREAT)
+    fcntl.flock(fd, fcntl.LOCK_EX)
+    entered = threading.Event()
+
+    def reader():
+        with lock.read():
+            entered.set()
+
+    t = threading.Thread(target=reader)
+    t.start()
+    assert not entered.wait(0.2)
+    os.close(fd)
+    assert entered.wait(2)
+    t.join(2)
+
+    with lock.read(), lock.read():
+        pass  # shared holders in one process do not block each other
+    with lock.write():
+        pass
+    assert lock.version == 1
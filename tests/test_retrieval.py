@@ -1,4 +1,5 @@
-import os, uuid, datetime
+import os, json, uuid, datetime
+import pytest
 from app.db import init_db, insert_document, insert_chunks
 from app.retrieval.vectorstore import VectorStore
 
@@ -18,3 +19,122 @@ def test_vectorstore_add_and_search(tmp_path, monkeypatch):
     insert_chunks(rows)
     out = vs.search("hello", k=2)
     assert len(out) == 2
+
+def test_sharded_collection_fans_out_and_merges(tmp_path, monkeypatch):
+    import app.db as db
+    import app.retrieval.collections as colls
+    monkeypatch.setattr(db, "DB_PATH", str(tmp_path / "meta.db"))
+    monkeypatch.setattr(colls, "COLLECTIONS_DIR", str(tmp_path / "collections"))
+    init_db()
+
+    def embed(texts):
+        # "hello" aligns with axis 0; chunk texts carry their own weight on that axis
+        return [[1.0, 0.0] if t == "hello" else [float(t.split()[-1]), 1.0] for t in texts]
+
+    coll = colls.Collection("hr", embedding_fn=embed, num_shards=3)
+    shards = set()
+    for n in range(6):
+        doc_id = f"hr-doc-{n}"
+        rows = [{"id": f"{doc_id}_0", "document_id": doc_id, "text": f"text {n}", "page": None, "heading": None, "source_uri": "", "faiss_id": -1}]
+        shards.add(coll.add_chunks(doc_id, rows))
+        insert_document({"id": doc_id, "title": "Doc", "source_uri": "", "created_at": datetime.datetime.utcnow().isoformat(), "tags": "", "collection": "hr"})
+        insert_chunks(rows)
+    assert len(shards) > 1
+    with db.get_conn() as conn:
+        placed = conn.execute("SELECT c.shard, c.faiss_id, d.collection FROM chunks c JOIN documents d ON d.id = c.document_id").fetchall()
+    assert {r["shard"] for r in placed} == shards and {r["collection"] for r in placed} == {"hr"}
+    assert colls.Collection("hr", embedding_fn=embed).num_shards == 3
+
+    out = coll.search("hello", k=2)
+    assert [o["text"] for o in out] == ["text 5", "text 4"]
+    assert colls.Collection("empty", embedding_fn=embed).search("hello") == []
+
+def test_snapshot_roundtrip(tmp_path, monkeypatch):
+    import app.db as db
+    import app.retrieval.collections as colls
+    import app.retrieval.snapshot as snap
+    for mod in (colls, snap):
+        monkeypatch.setattr(mod, "INDEX_PATH", str(tmp_path / "index.faiss"))
+        monkeypatch.setattr(mod, "MAP_PATH", str(tmp_path / "chunk_map.json"))
+    monkeypatch.setattr(colls, "COLLECTIONS_DIR", str(tmp_path / "collections"))
+    monkeypatch.setattr(db, "DB_PATH", str(tmp_path / "meta.db"))
+    init_db()
+
+    embed = lambda texts: [[float(t.split()[-1]), 1.0] for t in texts]
+    coll = colls.Collection("legal", embedding_fn=embed, num_shards=2)
+    for n in range(4):
+        doc_id = f"legal-doc-{n}"
+        rows = [{"id": f"{doc_id}_0", "document_id": doc_id, "text": f"text {n}", "page": None, "heading": None, "source_uri": "", "faiss_id": -1}]
+        coll.add_chunks(doc_id, rows)
+        insert_document({"id": doc_id, "title": "Doc", "source_uri": "", "created_at": datetime.datetime.utcnow().isoformat(), "tags": "", "collection": "legal"})
+        insert_chunks(rows)
+    before = coll.search("3", k=4)
+
+    path = str(tmp_path / "snap.jsonl.gz")
+    info = snap.export_snapshot(path)
+    assert snap.verify_snapshot(path)["sha256"] == info["sha256"]
+
+    with pytest.raises(snap.StoreNotEmpty):
+        snap.import_snapshot(path)
+    with pytest.raises(SystemExit) as exit_info:
+        snap.main(["import", path])
+    assert exit_info.value.code == 2
+    out = snap.import_snapshot(path, replace=True)
+    assert out["documents"] == 4 and out["chunks"] == 4 and out["vectors"] == 4
+
+    after = colls.Collection("legal", embedding_fn=embed).search("3", k=4)
+    assert [(h["chunk_id"], round(h["score"], 5)) for h in after] == [(h["chunk_id"], round(h["score"], 5)) for h in before]
+
+    with open(path, "rb") as f:
+        data = bytearray(f.read())
+    data[len(data) // 2] ^= 0xFF
+    bad = tmp_path / "bad.jsonl.gz"
+    bad.write_bytes(bytes(data))
+    with pytest.raises(snap.SnapshotError):
+        snap.verify_snapshot(str(bad))
+
+    # Checksum-valid but structurally broken snapshots are rejected and leave the store intact
+    import gzip
+    def write(name, records):
+        p = str(tmp_path / name)
+        with gzip.open(p, "wb") as f:
+            w = snap._Writer(f)
+            for r in records:
+                w.write(r)
+            f.write((json.dumps({"type": "end", "records": w.records, "sha256": w.sha.hexdigest()}) + "\n").encode())
+        return p
+    header = {"type": "header", "format": snap.FORMAT, "version": snap.VERSION}
+    doc = {"type": "document", "id": "legal-doc-0", "title": "Dup", "source_uri": "", "created_at": "", "tags": ""}
+    broken = {
+        "version.jsonl.gz": [{**header, "version": 99}],
+        "order.jsonl.gz": [header, {"type": "vectors", "collection": "legal", "shard": 0, "ids": [], "data": ""}],
+        "dupes.jsonl.gz": [header, doc, doc],
+    }
+    for name, records in broken.items():
+        with pytest.raises(snap.SnapshotError):
+            snap.import_snapshot(write(name, records), replace=True)
+    assert colls.Collection("legal", embedding_fn=embed).search("3", k=4) == after
+    assert not [p for p in tmp_path.iterdir() if p.name.startswith(".import-")]
+
+def test_first_manifest_fixes_shard_count(tmp_path, monkeypatch):
+    import app.retrieval.collections as colls
+    monkeypatch.setattr(colls, "COLLECTIONS_DIR", str(tmp_path / "collections"))
+    embed = lambda texts: [[1.0, 0.0]] * len(texts)
+
+    # Both built before either has written the manifest, as with concurrent first ingests
+    first = colls.Collection("security", embedding_fn=embed, num_shards=2)
+    second = colls.Collection("security", embedding_fn=embed, num_shards=4)
+    first.add_chunks("sec-doc-0", [{"id": "sec-doc-0_0", "text": "a"}])
+    for n in range(1, 8):
+        assert second.add_chunks(f"sec-doc-{n}", [{"id": f"sec-doc-{n}_0", "text": "b"}]) < 2
+    assert second.num_shards == 2
+
+def test_failed_export_leaves_no_temp_file(tmp_path, monkeypatch):
+    import app.retrieval.snapshot as snap
+    def broken(table):
+        raise RuntimeError("disk gone")
+        yield
+    monkeypatch.setattr(snap, "iter_rows", broken)
+    with pytest.raises(RuntimeError):
+        snap.export_snapshot(str(tmp_path / "snap.jsonl.gz"))
+    assert list(tmp_path.iterdir()) == []
@@ -0,0 +1,28 @@
+import threading, time
+from concurrent.futures import ThreadPoolExecutor
+from app.utils.singleflight import SingleFlight
+
+def test_concurrent_identical_calls_share_one_execution():
+    sf = SingleFlight()
+    calls = []
+    release = threading.Event()
+
+    def work():
+        calls.append(1)
+        release.wait(2)
+        return {"answer": "42"}
+
+    with ThreadPoolExecutor(max_workers=5) as pool:
+        futures = [pool.submit(sf.do, "q", work) for _ in range(5)]
+        while sf.stats["coalesced"] < 4:
+            time.sleep(0.01)
+        release.set()
+        results = [f.result() for f in futures]
+
+    assert len(calls) == 1
+    assert all(r == {"answer": "42"} for r, _ in results)
+    assert sorted(shared for _, shared in results) == [False, True, True, True, True]
+    assert sf.stats == {"executions": 1, "coalesced": 4, "in_flight": 0}
+
+    # Completed calls are not cached
+    assert sf.do("q", lambda: "fresh") == ("fresh", False)